@@ -1,5 +1,9 @@
+import logging
+import orjson
 from flask import Flask
+from flask_compress import Compress
 from flask_cors import CORS
+from flask_orjson import OrjsonProvider
 from flask_restx import Api
 from config import config
 
@@ -7,14 +11,34 @@ def create_app(config_name='development'):
     """Factory pattern para crear la aplicación Flask"""
     app = Flask(__name__)
     
+    # Serialización JSON con orjson (jsonify y request.get_json)
+    app.json_provider_class = OrjsonProvider
+    app.json = OrjsonProvider(app)
+    app.json.option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    
     # Cargar configuración
     app.config.from_object(config[config_name])
     app.config['JSON_AS_ASCII'] = False
-    app.config['RESTX_JSON'] = {'ensure_ascii': False}
+    
+    # Logging antes de importar los servicios y precargar datos
+    logging.basicConfig(
+        level=app.config['LOG_LEVEL'],
+        format='%(asctime)s %(levelname)s %(name)s: %(message)s',
+    )
+    # Salida compacta también para las respuestas serializadas por Flask-RESTX
+    app.config['RESTX_JSON'] = {
+        'ensure_ascii': False,
+        'indent': None,
+        'separators': (',', ':'),
+        'sort_keys': False,
+    }
     
     # Habilitar CORS
     CORS(app, resources={r"/*": {"origins": "*"}})
     
+    # Comprimir respuestas JSON según Accept-Encoding (br / gzip)
+    Compress(app)
+    
     # Crear API con Flask-RESTX (genera Swagger en /docs)
     api = Api(
         app,
@@ -28,4 +52,9 @@ def create_app(config_name='development'):
     from app.api.routes import ns
     api.add_namespace(ns, path='/api')
     
+    # Precargar datos de Emol (con preload_app los workers heredan la caché)
+    if app.config['WARMUP_CACHE']:
+        from app.services.diputados_service import warmup_cache
+        warmup_cache()
+    
     return app
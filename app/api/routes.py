@@ -37,6 +37,31 @@ resultado_dhondt_model = ns.model('ResultadoDHondt', {
     'elected_candidates': fields.List(fields.Raw())
 })
 
+# ============================================================
+# HELPERS
+# ============================================================
+
+# Segundos que navegadores/CDN pueden reutilizar una respuesta
+CACHE_MAX_AGE = 60
+DISTRITOS_MAX_AGE = 3600
+
+def json_response(data, max_age=None):
+    """
+    Serializa la respuesta con el proveedor JSON de la app (orjson).
+    Con max_age la respuesta es cacheable y lleva ETag: si el cliente
+    envía If-None-Match con el mismo ETag se responde 304 sin cuerpo.
+    Las respuestas con "error" o con escaños estimados (p. ej. Emol caído)
+    no se cachean.
+    """
+    response = make_response(jsonify(data))
+    response.headers["Content-Type"] = "application/json; charset=utf-8"
+    degradada = isinstance(data, dict) and ("error" in data or data.get("escanos_estimados"))
+    if max_age is not None and not degradada:
+        response.headers["Cache-Control"] = f"public, max-age={max_age}, stale-while-revalidate=300"
+        response.add_etag()
+        response.make_conditional(request)
+    return response
+
 # ============================================================
 # ENDPOINTS
 # ============================================================
@@ -64,9 +89,7 @@ class EmolResource(Resource):
         """Obtiene candidatos de Emol con votos de encuesta para un distrito."""
         try:
             result = diputados_service.get_emol_csv(distrito)
-            response = make_response(jsonify(result))
-            response.headers["Content-Type"] = "application/json; charset=utf-8"
-            return response
+            return json_response(result, max_age=CACHE_MAX_AGE)
         except Exception as e:
             ns.abort(500, str(e))
 
@@ -94,9 +117,7 @@ class DhondtResource(Resource):
         """Calcula D'Hondt para un distrito específico. Acepta '10' o 'D10'."""
         try:
             result = diputados_service.compute_dhondt(distrito)
-            response = make_response(jsonify(result))
-            response.headers["Content-Type"] = "application/json; charset=utf-8"
-            return response
+            return json_response(result, max_age=CACHE_MAX_AGE)
         except Exception as e:
             ns.abort(500, str(e))
 
@@ -120,13 +141,14 @@ class DhondtPostResource(Resource):
     @ns.response(500, 'Error del servidor')
     def post(self):
         """Calcula D'Hondt enviando el distrito en el body JSON."""
+        # Solo bodies application/json; el parseo pasa por orjson
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            ns.abort(400, "Se espera un body JSON con el campo 'distrito'")
         try:
-            data = request.get_json(force=True)
             distrito = str(data.get("distrito", "10"))
             result = diputados_service.compute_dhondt(distrito)
-            response = make_response(jsonify(result))
-            response.headers["Content-Type"] = "application/json; charset=utf-8"
-            return response
+            return json_response(result)
         except Exception as e:
             ns.abort(500, str(e))
 
@@ -142,9 +164,7 @@ class ResumenResource(Resource):
         """Calcula resumen nacional agregando resultados de todos los 28 distritos."""
         try:
             result = diputados_service.resumen_nacional()
-            response = make_response(jsonify(result))
-            response.headers["Content-Type"] = "application/json; charset=utf-8"
-            return response
+            return json_response(result, max_age=CACHE_MAX_AGE)
         except Exception as e:
             ns.abort(500, str(e))
 
@@ -160,9 +180,7 @@ class EncuestasResource(Resource):
         """Obtiene todas las encuestas cargadas desde la API externa."""
         try:
             encuestas = diputados_service.encuesta
-            response = make_response(jsonify(encuestas))
-            response.headers["Content-Type"] = "application/json; charset=utf-8"
-            return response
+            return json_response(encuestas, max_age=CACHE_MAX_AGE)
         except Exception as e:
             ns.abort(500, str(e))
 
@@ -193,9 +211,7 @@ class ResultadoResource(Resource):
         """
         try:
             result = diputados_service.get_resultado_por_pacto(distrito)
-            response = make_response(jsonify(result))
-            response.headers["Content-Type"] = "application/json; charset=utf-8"
-            return response
+            return json_response(result, max_age=CACHE_MAX_AGE)
         except Exception as e:
             ns.abort(500, str(e))
 
@@ -221,10 +237,9 @@ class DistritosResource(Resource):
         ]
         """
         try:
-            distritos = get_distritos()
-            response = make_response(jsonify(distritos))
-            response.headers["Content-Type"] = "application/json; charset=utf-8"
-            return response
+            distritos, desde_emol = get_distritos()
+            # Los nombres por defecto (db.json caído) no se cachean
+            return json_response(distritos, max_age=DISTRITOS_MAX_AGE if desde_emol else None)
         except Exception as e:
             ns.abort(500, str(e))
 
@@ -256,9 +271,7 @@ class CandidatosResource(Resource):
         """
         try:
             result = diputados_service.get_todos_candidatos()
-            response = make_response(jsonify(result))
-            response.headers["Content-Type"] = "application/json; charset=utf-8"
-            return response
+            return json_response(result, max_age=CACHE_MAX_AGE)
         except Exception as e:
             ns.abort(500, str(e))
 
@@ -79,7 +79,7 @@ class ResultadoDHondt(BaseModel):
 # DATACLASSES (para procesamiento interno)
 # ============================================================
 
-@dataclass
+@dataclass(slots=True)
 class CandidatoData:
     id: str
     nombre: str
@@ -88,14 +88,14 @@ class CandidatoData:
     matched_from: Optional[str] = None
     match_quality: Optional[float] = 0.0
 
-@dataclass
+@dataclass(slots=True)
 class PartidoData:
     id: str
     nombre: str
     votos: float
     pacto_id: Optional[str] = None
 
-@dataclass
+@dataclass(slots=True)
 class PactoData:
     id: str
     nombre: str
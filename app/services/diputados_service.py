@@ -1,47 +1,94 @@
 # app/services/diputados_service.py
 from __future__ import annotations
-from dataclasses import dataclass, asdict
-from typing import List, Dict, Any, Optional
+from dataclasses import dataclass
+from typing import List, Dict, Any, Final, Optional, Tuple
 import unicodedata
 import re
-import difflib
-import json
+import csv
+import functools
+import io
+import itertools
+import logging
 import os
-import pandas as pd
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from cachetools import TTLCache, cached
+from numba import njit
+from rapidfuzz import fuzz, process
 from app.models.models import Partido, Candidato, Lista
 
+logger = logging.getLogger(__name__)
+
 # ============================================================
 # CONFIGURACIÓN
 # ============================================================
 EMOL_CSV_URL = "https://www.emol.com/especiales/2025/nacional/elecciones/data/dip.csv"
 DB_URL = "https://www.emol.com/especiales/2025/nacional/elecciones/data/db.json"
 
+
+# Segundos que se reutilizan las descargas de Emol antes de pedirlas de nuevo
+CACHE_TTL = 60
+
+# Threads para procesar los 28 distritos en paralelo
+MAX_WORKERS = 10
+
+
+def _crear_sesion() -> requests.Session:
+    """Sesión HTTP compartida: reutiliza conexiones (keep-alive) hacia Emol y la API de encuestas."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=2 * MAX_WORKERS,
+        max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(502, 503, 504)),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+SESSION = _crear_sesion()
+
 def load_pactos_from_file() -> List[Dict[str, Any]]:
     """Carga los pactos desde el archivo JSON."""
     try:
         ruta_pactos = os.path.join(os.path.dirname(__file__), '..', 'data', 'pactos.json')
-        with open(ruta_pactos, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with open(ruta_pactos, 'rb') as f:
+            data = orjson.loads(f.read())
             return data.get('pactos', [])
     except Exception as e:
-        print(f"⚠️ Error cargando pactos.json: {e}")
+        logger.warning("⚠️ Error cargando pactos.json: %s", e)
         return []
 
 # Cargar pactos al iniciar
 PACTOS_MAPPING = load_pactos_from_file()
 
+# Índice id -> nombre (reversed: ante ids repetidos gana el primero)
+_PACTO_NAME_BY_ID = {
+    p.get("id"): p.get("nombre", p.get("id")) for p in reversed(PACTOS_MAPPING)
+}
+
 def get_pacto_nombre(pacto_id: str) -> str:
     """Obtiene el nombre completo de un pacto desde su ID."""
-    for pacto in PACTOS_MAPPING:
-        if pacto.get("id") == pacto_id:
-            return pacto.get("nombre", pacto_id)
-    return pacto_id
+    return _PACTO_NAME_BY_ID.get(pacto_id, pacto_id)
 
 # ============================================================
 # DATACLASSES
 # ============================================================
-@dataclass
+@dataclass(slots=True)
+class FilaEmol:
+    """Fila del CSV de Emol con solo las columnas que se usan (vacío -> None)."""
+    zona: int
+    pacto: Optional[str]
+    cupo: Optional[str]
+    nombre: Optional[str]
+    id_foto: Optional[str]
+
+@dataclass(slots=True)
 class Candidate:
     id: str
     name: str
@@ -49,39 +96,61 @@ class Candidate:
     party_id: str
     matched_from: Optional[str] = None
     match_quality: Optional[float] = 0.0
+    pact_id: Optional[str] = None
 
-@dataclass
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "votes": self.votes,
+            "party_id": self.party_id,
+            "matched_from": self.matched_from,
+            "match_quality": self.match_quality,
+            "pact_id": self.pact_id,
+        }
+
+@dataclass(slots=True)
 class Party:
     id: str
     name: str
     votes: float
     pact_id: Optional[str] = None
 
-@dataclass
+    def to_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "name": self.name, "votes": self.votes, "pact_id": self.pact_id}
+
+@dataclass(slots=True)
 class Pact:
     id: str
     name: str
     votes: int = 0
 
+    def to_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "name": self.name, "votes": self.votes}
+
 # ============================================================
 # FUNCIONES AUXILIARES
 # ============================================================
 
+_DIACRITICOS_RE = re.compile(r"[\u0300-\u036f]")
+_DISTRITO_RE = re.compile(r"\d+")
+
+
+@functools.lru_cache(maxsize=8192)
 def normalize(s: str) -> str:
     """Normaliza texto: minúsculas, quita acentos."""
     if not s:
         return ""
     s = s.lower().strip()
     s = unicodedata.normalize("NFD", s)
-    s = re.sub(r"[\u0300-\u036f]", "", s)
+    s = _DIACRITICOS_RE.sub("", s)
     return s
 
 
 def normalize_district(distrito: str) -> str:
     """Normaliza el número de distrito. Acepta '10', 'D10', 'd10', etc."""
     # Extraer solo los números
-    import re
-    match = re.search(r'\d+', str(distrito))
+    match = _DISTRITO_RE.search(str(distrito))
     if match:
         num = match.group(0)
         # Asegurar que esté entre 1 y 28
@@ -94,6 +163,22 @@ def normalize_district(distrito: str) -> str:
     return str(distrito)
 
 
+@njit("int64[:](float64[:], int64)", cache=True)
+def _dhondt_core(votos, num_escanos):
+    """
+    Núcleo compilado de D'Hondt: cada escaño va a la lista con el mayor
+    cociente siguiente votos / (escaños + 1). En empate gana la primera.
+    La firma explícita compila al importar y no en el primer request.
+    """
+    escanos = np.zeros(votos.shape[0], np.int64)
+    siguiente = votos.copy()
+    for _ in range(num_escanos):
+        i = siguiente.argmax()
+        escanos[i] += 1
+        siguiente[i] = votos[i] / (escanos[i] + 1)
+    return escanos
+
+
 def dhondt_alloc(votos_por_lista: Dict[str, float], num_escaños: int) -> Dict[str, int]:
     """
     Calcula la asignación de escaños usando el método D'Hondt.
@@ -105,58 +190,117 @@ def dhondt_alloc(votos_por_lista: Dict[str, float], num_escaños: int) -> Dict[s
     Returns:
         Dict con {nombre_lista: escaños_asignados}
     """
-    # 1️⃣ Crear tabla de cocientes (votos / divisor)
-    cocientes = []
-    for lista, votos in votos_por_lista.items():
-        for divisor in range(1, num_escaños + 1):
-            valor = votos / divisor
-            cocientes.append((valor, lista))
-    
-    # 2️⃣ Ordenar de mayor a menor
-    cocientes.sort(reverse=True, key=lambda x: x[0])
-    
-    # 3️⃣ Seleccionar los N cocientes más altos
-    ganadores = cocientes[:num_escaños]
-    
-    # 4️⃣ Contar escaños por lista
-    asignacion = {lista: 0 for lista in votos_por_lista}
-    for _, lista in ganadores:
-        asignacion[lista] += 1
+    if not votos_por_lista or num_escaños <= 0:
+        return {lista: 0 for lista in votos_por_lista}
+
+    listas = list(votos_por_lista)
+    votos = np.fromiter(votos_por_lista.values(), dtype=np.float64, count=len(listas))
+    escaños = _dhondt_core(votos, num_escaños)
     
-    return asignacion
+    return {lista: int(n) for lista, n in zip(listas, escaños)}
 
 
 def load_encuesta(filename: str = "encuesta_d10.json") -> Dict:
     """Carga encuesta desde API externa: https://dhondt.azurewebsites.net/api/encuestas"""
     try:
         external_url = "https://dhondt.azurewebsites.net/api/encuestas"
-        r = requests.get(external_url, timeout=10)
+        r = SESSION.get(external_url, timeout=10)
         r.raise_for_status()
-        data = r.json()
-        print("✅ Encuestas cargadas desde API externa")
+        data = orjson.loads(r.content)
+        logger.info("✅ Encuestas cargadas desde API externa")
         return data
     except Exception as e:
-        print(f"❌ Error cargando encuestas desde API externa: {e}")
+        logger.error("❌ Error cargando encuestas desde API externa: %s", e)
         # Retorna un diccionario vacío para evitar crashes
         return {}
 
 
-def get_seats_for_district_api(distrito: str) -> int:
-    """Obtiene cantidad de escaños desde API oficial de Emol."""
+# Versión de los datos en caché: cambia cada vez que se renueva una descarga
+_versiones = itertools.count(1)
+_data_version = 0
+
+
+def _renovar_version() -> None:
+    global _data_version
+    _data_version = next(_versiones)
+
+
+def data_version() -> int:
+    """
+    Versión actual de los datos de Emol. Consulta las cachés primero para que
+    una entrada vencida se renueve (y cambie la versión) antes de leerla.
+    Cada descarga va por separado: si una falla, la otra igual se renueva.
+    """
+    # Los errores se reportan en quien use los datos
+    try:
+        _fetch_json(DB_URL)
+    except Exception:
+        pass
+    try:
+        _load_emol_csv()
+    except Exception:
+        pass
+    return _data_version
+
+
+@cached(TTLCache(maxsize=8, ttl=CACHE_TTL), condition=threading.Condition())
+def _fetch_json(url: str) -> Dict[str, Any]:
+    """Descarga un JSON y lo mantiene en caché por CACHE_TTL segundos."""
+    r = SESSION.get(url, timeout=10)
+    r.raise_for_status()
+    data = orjson.loads(r.content)
+    _renovar_version()
+    return data
+
+
+@cached(TTLCache(maxsize=1, ttl=CACHE_TTL), condition=threading.Condition())
+def _load_emol_csv() -> Dict[int, List[FilaEmol]]:
+    """
+    Descarga el CSV nacional de Emol una vez y agrupa sus filas por zona
+    (en caché por CACHE_TTL segundos).
+    """
+    r = SESSION.get(EMOL_CSV_URL, timeout=10)
+    r.raise_for_status()
+    por_zona: Dict[int, List[FilaEmol]] = {}
+    for fila in csv.DictReader(io.StringIO(r.content.decode("utf-8"))):
+        zona = int(fila["zona"])
+        por_zona.setdefault(zona, []).append(FilaEmol(
+            zona=zona,
+            pacto=fila.get("pacto") or None,
+            cupo=fila.get("cupo") or None,
+            nombre=fila.get("nombre") or None,
+            id_foto=fila.get("id_foto") or None,
+        ))
+    _renovar_version()
+    return por_zona
+
+
+def _votos_de_fila(enc: Dict[str, Any]) -> float:
+    """Votos de una fila de la encuesta como float; un valor inválido cuenta como 0."""
+    try:
+        return float(enc.get("votos", 0) or 0)
+    except (ValueError, TypeError):
+        logger.warning("⚠️ Votos inválidos en encuesta para %s: %r", enc.get("nombre"), enc.get("votos"))
+        return 0.0
+
+
+def get_seats_for_district_api(distrito: str) -> Tuple[int, bool]:
+    """
+    Obtiene cantidad de escaños desde API oficial de Emol.
+    Retorna (escaños, estimado); estimado indica que se usó el valor por defecto.
+    """
     try:
         codigo = f"60{str(distrito).zfill(2)}"
-        r = requests.get(DB_URL, timeout=10)
-        r.raise_for_status()
-        data = r.json()
+        data = _fetch_json(DB_URL)
         entry = data.get("dbzonas", {}).get(codigo)
         if entry and "q" in entry:
-            return int(entry["q"])
+            return int(entry["q"]), False
         else:
-            print(f"⚠️ No se encontró distrito {codigo}")
-            return 5
+            logger.warning("⚠️ No se encontró distrito %s", codigo)
+            return 5, True
     except Exception as e:
-        print(f"⚠️ Error obteniendo escaños: {e}")
-        return 5
+        logger.warning("⚠️ Error obteniendo escaños: %s", e)
+        return 5, True
 
 
 def assign_votes_to_candidates(
@@ -169,7 +313,7 @@ def assign_votes_to_candidates(
     
     Args:
         candidates: Lista de candidatos de Emol
-        encuesta_lista: Lista de candidatos de encuesta
+        encuesta_lista: Lista de candidatos de encuesta (con nombre_norm y votos)
         threshold: Umbral mínimo de similitud (0-1)
         
     Returns:
@@ -181,30 +325,31 @@ def assign_votes_to_candidates(
             c["matched_from"] = None
             c["match_quality"] = 0.0
         return candidates
+    if not candidates:
+        return candidates
 
     names = [normalize(c["name"]) for c in candidates]
+    nombres_encuesta = [e["nombre_norm"] for e in encuesta_lista]
     matched_candidates = set()
     matched_encuestas = set()
 
-    for e_idx, encuesta in enumerate(encuesta_lista):
-        nombre_encuesta = normalize(encuesta.get("nombre", ""))
-        best_match = None
-        best_ratio = 0.0
+    # Similitud encuesta x candidato (0-100); bajo el umbral queda en 0
+    scores = process.cdist(nombres_encuesta, names, scorer=fuzz.ratio, score_cutoff=threshold * 100)
+    best_matches = scores.argmax(axis=1)
+    best_ratios = scores.max(axis=1) / 100
 
-        # Buscar candidato más parecido
-        for i, name in enumerate(names):
-            ratio = difflib.SequenceMatcher(None, nombre_encuesta, name).ratio()
-            if ratio > best_ratio:
-                best_ratio = ratio
-                best_match = i
+    for e_idx, encuesta in enumerate(encuesta_lista):
+        # Candidato más parecido
+        best_match = int(best_matches[e_idx])
+        best_ratio = float(best_ratios[e_idx])
 
         # Aceptar match si supera umbral
-        if best_match is not None and best_ratio >= threshold:
+        if best_ratio > 0 and best_ratio >= threshold:
             if best_match in matched_candidates:
                 raise ValueError(f"Candidato {candidates[best_match]['name']} duplicado")
 
-            candidates[best_match]["votes"] = float(encuesta.get("votos", 0) or 0)
-            candidates[best_match]["matched_from"] = encuesta.get("nombre")
+            candidates[best_match]["votes"] = encuesta["votos"]
+            candidates[best_match]["matched_from"] = encuesta["nombre"]
             candidates[best_match]["match_quality"] = round(best_ratio, 3)
 
             matched_candidates.add(best_match)
@@ -220,33 +365,56 @@ def assign_votes_to_candidates(
     # Verificar que todas las encuestas fueron pareadas
     unmatched = [enc["nombre"] for idx, enc in enumerate(encuesta_lista) if idx not in matched_encuestas]
     if unmatched:
-        print(f"⚠️ No se pudo hacer match: {', '.join(unmatched[:3])}")
+        logger.warning("⚠️ No se pudo hacer match: %s", ", ".join(unmatched[:3]))
 
     return candidates
 
 
-def fetch_emol_csv(distrito: str) -> pd.DataFrame:
-    """Descarga CSV de Emol y filtra por distrito."""
+def fetch_emol_csv(distrito: str) -> List[FilaEmol]:
+    """Obtiene las filas del CSV de Emol (candidatos) de un distrito."""
     try:
-        df = pd.read_csv(EMOL_CSV_URL, encoding="utf-8")
         codigo_zona = int("60" + str(distrito).zfill(2))
-        df_filtered = df[df["zona"] == codigo_zona]
-        return df_filtered
+        return _load_emol_csv().get(codigo_zona, [])
+    except Exception as e:
+        logger.warning("⚠️ Error descargando CSV: %s", e)
+        return []
+
+
+def invalidate_cache() -> None:
+    """
+    Descarta las descargas de Emol en caché; la próxima consulta las vuelve a
+    pedir y cambia data_version, invalidando también los D'Hondt memoizados.
+    """
+    _fetch_json.cache_clear()
+    _load_emol_csv.cache_clear()
+
+
+def warmup_cache() -> None:
+    """
+    Precarga db.json, el CSV nacional de Emol y la encuesta para que la primera
+    request no espere la red. Un fallo del upstream no impide el arranque.
+    """
+    try:
+        _fetch_json(DB_URL)
+        _load_emol_csv()
+        logger.info("✅ Caché de Emol precargada")
+    except Exception as e:
+        logger.warning("⚠️ Error precargando caché de Emol: %s", e)
+    try:
+        diputados_service.precargar_encuesta()
     except Exception as e:
-        print(f"⚠️ Error descargando CSV: {e}")
-        return pd.DataFrame()
+        logger.warning("⚠️ Error precargando encuesta: %s", e)
 
 
-def get_distritos() -> List[Dict[str, Any]]:
+def get_distritos() -> Tuple[List[Dict[str, Any]], bool]:
     """
     Obtiene lista de todos los distritos con su nombre real desde DB_URL.
     Estructura: [{"numero": 1, "nombre": "Distrito 1 - Región de Arica y Parinacota"}, ...]
+    Retorna (distritos, desde_emol); desde_emol es False si se usaron nombres por defecto.
     """
     try:
-        print("Obteniendo distritos desde DB_URL de EMOL...")
-        r = requests.get(DB_URL, timeout=10)
-        r.raise_for_status()
-        data = r.json()
+        logger.debug("Obteniendo distritos desde DB_URL de EMOL...")
+        data = _fetch_json(DB_URL)
         
         distritos_list = []
         
@@ -285,66 +453,198 @@ def get_distritos() -> List[Dict[str, Any]]:
         distritos_list.sort(key=lambda x: x["numero"])
         
         if len(distritos_list) > 0:
-            print(f"✅ {len(distritos_list)} distritos obtenidos desde DB_URL")
-            return distritos_list
+            logger.debug("✅ %d distritos obtenidos desde DB_URL", len(distritos_list))
+            return distritos_list, True
         else:
-            print("⚠️ No se encontraron distritos en DB_URL, usando valores por defecto")
-            return [{"numero": i, "nombre": f"Distrito {i}"} for i in range(1, 29)]
+            logger.warning("⚠️ No se encontraron distritos en DB_URL, usando valores por defecto")
+            return [{"numero": i, "nombre": f"Distrito {i}"} for i in range(1, 29)], False
         
     except Exception as e:
-        print(f"❌ Error obteniendo distritos: {e}")
-        return [{"numero": i, "nombre": f"Distrito {i}"} for i in range(1, 29)]
+        logger.error("❌ Error obteniendo distritos: %s", e)
+        return [{"numero": i, "nombre": f"Distrito {i}"} for i in range(1, 29)], False
 
 
 # ============================================================
 # SERVICIO ELECTORAL
 # ============================================================
 
+# Mapeo de colores por pacto (basado en imagen mostrada)
+_COLORES_PACTOS: Final[Dict[str, str]] = {
+    "Unidad por Chile (FA, PS, DC, PPD, PL, PR)": "#FF1493",  # Rosa
+    "Chile Grande y Unido (UDI, RN, Evópoli, Demócratas)": "#ADD8E6",  # Azul
+    "Cambio por Chile (PSC, PNL, REP)": "#FFFF99",  # Amarillo
+    "Movimiento Amarillos por Chile": "#FFFF99",  # Amarillo
+    "Partido de la Gente": "#D2B48C",  # Beige/Marrón
+    "Verdes, Regionalistas y Humanistas (FRVS, AH)": "#90EE90",  # Verde claro
+}
+
 class DiputadosService:
     """Servicio para cálculos electorales."""
     
     def __init__(self):
-        self.encuesta = load_encuesta()
-        self.encuestas_by_d = {
-            str(i): self.encuesta.get(f"D{i}", []) 
-            for i in range(1, 29)
-        }
+        # La encuesta se descarga en el primer uso (o en warmup_cache)
+        self._encuesta_version = 1
+        # (encuesta, encuestas_by_d, _encuesta_norm); el lock evita que los
+        # threads de resumen_nacional/get_todos_candidatos la descarguen a la vez
+        self._datos_encuesta: Optional[Tuple[Dict, Dict, Dict]] = None
+        self._encuesta_lock = threading.Lock()
+
+    def _cargar_encuesta(self) -> Tuple[Dict, Dict, Dict]:
+        """Descarga la encuesta y arma sus índices una sola vez (o tras reload_encuesta)."""
+        datos = self._datos_encuesta
+        if datos is None:
+            with self._encuesta_lock:
+                datos = self._datos_encuesta
+                if datos is None:
+                    encuesta = load_encuesta()
+                    por_distrito = self._indexar_encuesta(encuesta)
+                    listas = {
+                        d: ([enc["nombre_norm"] for enc in lista], [enc["votos"] for enc in lista])
+                        for d, lista in por_distrito.items()
+                    }
+                    datos = self._datos_encuesta = (encuesta, por_distrito, listas)
+        return datos
+
+    @staticmethod
+    def _indexar_encuesta(encuesta: Dict) -> Dict[str, List[Dict[str, Any]]]:
+        """Encuesta por distrito con nombre normalizado y votos como float."""
+        por_distrito: Dict[str, List[Dict[str, Any]]] = {str(i): [] for i in range(1, 29)}
+        for clave, lista in encuesta.items():
+            if clave[:1] == "D" and clave[1:] in por_distrito:
+                por_distrito[clave[1:]] = [
+                    {
+                        "nombre": enc.get("nombre"),
+                        "nombre_norm": normalize(enc.get("nombre", "")),
+                        "votos": _votos_de_fila(enc),
+                    }
+                    for enc in lista
+                ]
+        return por_distrito
+
+    @property
+    def encuesta(self) -> Dict:
+        return self._cargar_encuesta()[0]
+
+    @property
+    def encuestas_by_d(self) -> Dict[str, List[Dict[str, Any]]]:
+        return self._cargar_encuesta()[1]
+
+    @property
+    def _encuesta_norm(self) -> Dict[str, tuple]:
+        """
+        Por distrito, nombres normalizados y votos como listas paralelas;
+        son las entradas del cdist de _build_candidates_cached.
+        """
+        return self._cargar_encuesta()[2]
+
+    def precargar_encuesta(self) -> None:
+        """Descarga la encuesta y arma sus índices por distrito."""
+        self._cargar_encuesta()
+
+    def reload_encuesta(self) -> None:
+        """Vuelve a cargar la encuesta; los D'Hondt memoizados con la anterior dejan de usarse."""
+        with self._encuesta_lock:
+            self._datos_encuesta = None
+        # Se incrementa al final: una versión nueva siempre ve la encuesta nueva
+        self._encuesta_version += 1
+
+    def _build_candidates(self, distrito: str) -> List[Candidate]:
+        """
+        Candidatos de Emol de un distrito con los votos de su match en la
+        encuesta (fuzz.ratio >= 80). Cada fila de la encuesta se acredita a un
+        solo candidato: el de mayor similitud. Se memoiza igual que
+        compute_dhondt; no modificar el resultado.
+        """
+        return self._build_candidates_cached(distrito, data_version(), self._encuesta_version)
+
+    @functools.lru_cache(maxsize=32)
+    def _build_candidates_cached(self, distrito: str, version: int, encuesta_version: int) -> List[Candidate]:
+        filas = fetch_emol_csv(distrito)
+        nombres_encuesta, votos_encuesta = self._encuesta_norm.get(distrito, ([], []))
+        # Nombre exacto -> primer índice: el fuzzy matching elegiría el mismo
+        exactos: Dict[str, int] = {}
+        for i, nombre in enumerate(nombres_encuesta):
+            exactos.setdefault(nombre, i)
+
+        nombres_emol = [normalize(row.nombre) for row in filas]
+        # Fila de encuesta -> (score, candidato): cada fila acredita sus votos
+        # a un solo candidato, el de mayor score (en empate, el primero)
+        asignadas: Dict[int, Tuple[float, int]] = {}
+
+        def acreditar(idx: int, enc: int, score: float) -> None:
+            actual = asignadas.get(enc)
+            if actual is None or score > actual[0]:
+                asignadas[enc] = (score, idx)
+
+        pendientes = []
+        for idx, nombre_emol in enumerate(nombres_emol):
+            if nombre_emol in exactos:
+                acreditar(idx, exactos[nombre_emol], 100.0)
+            else:
+                pendientes.append(idx)
+
+        # El resto en una sola matriz fila x encuesta (0-100); bajo 80 queda en 0
+        if pendientes and nombres_encuesta:
+            scores = process.cdist(
+                [nombres_emol[idx] for idx in pendientes], nombres_encuesta,
+                scorer=fuzz.ratio, score_cutoff=80,
+            )
+            mejores = scores.argmax(axis=1)
+            for fila, idx, mejor in zip(scores, pendientes, mejores):
+                if fila[mejor] > 0:
+                    acreditar(idx, int(mejor), float(fila[mejor]))
+
+        votos = [0.0] * len(filas)
+        for enc, (_, idx) in asignadas.items():
+            votos[idx] = votos_encuesta[enc]
+
+        candidates = [
+            Candidate(
+                id=row.id_foto or str(idx),
+                name=row.nombre,
+                party_id=row.cupo,
+                pact_id=row.pacto,
+                votes=votos[idx],
+            )
+            for idx, row in enumerate(filas)
+        ]
+        return candidates
 
     def get_emol_csv(self, distrito: str) -> Dict[str, Any]:
         """Obtiene candidatos de un distrito con votos de encuesta."""
         distrito = normalize_district(distrito)
-        df = fetch_emol_csv(distrito)
+        filas = fetch_emol_csv(distrito)
         
-        if df.empty:
+        if not filas:
             return {"error": f"No se encontraron datos para distrito {distrito}"}
 
-        seats = get_seats_for_district_api(distrito)
+        seats, escanos_estimados = get_seats_for_district_api(distrito)
         encuesta_lista = self.encuestas_by_d.get(str(distrito), [])
 
         # Construir candidatos
         candidates = [
             {
-                "id": str(row.get("id_foto", idx)),
-                "name": row["nombre"],
+                "id": row.id_foto or str(idx),
+                "name": row.nombre,
                 "votes": 0.0,
-                "party_id": row.get("cupo", ""),
+                "party_id": row.cupo or "",
             }
-            for idx, (_, row) in enumerate(df.iterrows())
+            for idx, row in enumerate(filas)
         ]
 
-        # Pactos y partidos
-        pact_ids = sorted(set(df["pacto"].dropna().unique()))
-        pacts = [Pact(id=p, name=p) for p in pact_ids]
-
-        party_ids = sorted(set(df["cupo"].dropna().unique()))
+        # Pactos y partidos en una sola pasada; el pacto de cada partido
+        # es el de su primera fila en el CSV
+        pact_ids = set()
+        pact_of_cupo: Dict[str, Optional[str]] = {}
+        for row in filas:
+            if row.pacto:
+                pact_ids.add(row.pacto)
+            if row.cupo:
+                pact_of_cupo.setdefault(row.cupo, row.pacto)
+        pacts = [Pact(id=p, name=p) for p in sorted(pact_ids)]
         parties = [
-            Party(
-                id=pid,
-                name=pid,
-                votes=0,
-                pact_id=next((df[df["cupo"] == pid]["pacto"].iloc[0] for _ in [None] if True), None)
-            )
-            for pid in party_ids
+            Party(id=pid, name=pid, votes=0, pact_id=pact_of_cupo[pid])
+            for pid in sorted(pact_of_cupo)
         ]
 
         # Asignar votos desde encuesta
@@ -353,65 +653,53 @@ class DiputadosService:
         return {
             "distrito": distrito,
             "seats": seats,
+            "escanos_estimados": escanos_estimados,
             "threshold": 0.0,
             "level": "pact",
-            "pacts": [asdict(p) for p in pacts],
-            "parties": [asdict(p) for p in parties],
+            "pacts": [p.to_dict() for p in pacts],
+            "parties": [p.to_dict() for p in parties],
             "candidates": candidates_with_votes,
         }
 
     def compute_dhondt(self, distrito: str) -> Dict[str, Any]:
-        """Calcula D'Hondt completo para un distrito."""
-        distrito = normalize_district(distrito)
-        df = fetch_emol_csv(distrito)
-        print(distrito)
-        if df.empty:
+        """
+        Calcula D'Hondt completo para un distrito. El resultado se reutiliza
+        mientras no cambien los datos de Emol (ver data_version) ni la encuesta.
+        """
+        return self._compute_dhondt_cached(
+            normalize_district(distrito), data_version(), self._encuesta_version
+        )
+
+    @functools.lru_cache(maxsize=64)
+    def _compute_dhondt_cached(self, distrito: str, version: int, encuesta_version: int) -> Dict[str, Any]:
+        """Cálculo de compute_dhondt; las versiones solo forman parte de la clave de caché."""
+        filas = fetch_emol_csv(distrito)
+        logger.debug("Calculando D'Hondt del distrito %s", distrito)
+        if not filas:
             return {"error": f"No hay datos para distrito {distrito}"}
 
-        seats = get_seats_for_district_api(distrito)
-        encuesta_lista = self.encuestas_by_d.get(str(distrito), [])
+        seats, escanos_estimados = get_seats_for_district_api(distrito)
 
         # Candidatos
-        candidates = []
-        for idx, (_, row) in enumerate(df.iterrows()):
-            nombre_emol = normalize(row.get("nombre", ""))
-            best_ratio = 0.0
-            best_enc = None
-
-            for enc in encuesta_lista:
-                nombre_enc = normalize(enc.get("nombre", ""))
-                ratio = difflib.SequenceMatcher(None, nombre_emol, nombre_enc).ratio()
-                if ratio > best_ratio:
-                    best_ratio = ratio
-                    best_enc = enc
-
-
-            votos = float(best_enc["votos"]) if best_ratio >= 0.8 else 0.0
-
-            candidates.append(Candidate(
-                id=str(row.get("id_foto", idx)),
-                name=row.get("nombre"),
-                party_id=row.get("cupo"),
-                votes=votos,
-            ))
+        candidates = self._build_candidates(distrito)
 
-        # Agrupar por partido
-        parties = []
-        seen_parties = set()
-        for _, row in df.iterrows():
-            partido = row.get("cupo")
-            pacto = row.get("pacto")
-            if partido and partido not in seen_parties:
-                votos = sum(c.votes for c in candidates if c.party_id == partido)
-                seen_parties.add(partido)
-                parties.append(Party(id=partido, name=partido, pact_id=pacto, votes=votos))
+        # Agrupar por partido en una sola pasada (orden de aparición)
+        candidatos_por_partido: Dict[str, List[Candidate]] = {}
+        for c in candidates:
+            if c.party_id:
+                candidatos_por_partido.setdefault(c.party_id, []).append(c)
+        parties = [
+            Party(id=partido, name=partido, pact_id=grupo[0].pact_id, votes=sum(c.votes for c in grupo))
+            for partido, grupo in candidatos_por_partido.items()
+        ]
+        pact_of_party = {p.id: p.pact_id for p in parties}
 
         # Agrupar por pacto
-        pacts = []
-        pact_names = df["pacto"].dropna().unique().tolist()
-        for name in pact_names:
-            votos = sum(p.votes for p in parties if p.pact_id == name)
-            pacts.append(Pact(id=name, name=name, votes=votos))
+        votos_por_pacto = {c.pact_id: 0 for c in candidates if c.pact_id}
+        for p in parties:
+            if p.pact_id in votos_por_pacto:
+                votos_por_pacto[p.pact_id] += p.votes
+        pacts = [Pact(id=name, name=name, votes=votos) for name, votos in votos_por_pacto.items()]
 
         # Aplicar D'Hondt a pactos
         pact_votes = {p.id: p.votes for p in pacts if p.id}
@@ -427,7 +715,7 @@ class DiputadosService:
             sub_alloc = dhondt_alloc(sub_votes, n_seats)
             for pid, n in sub_alloc.items():
                 candidatos = sorted(
-                    [c for c in candidates if c.party_id == pid],
+                    candidatos_por_partido[pid],
                     key=lambda x: x.votes,
                     reverse=True,
                 )[:n]
@@ -441,7 +729,7 @@ class DiputadosService:
         for pacto in sorted(pact_alloc.keys(), key=lambda x: pact_alloc[x], reverse=True):
             candidatos_pacto = [
                 c for c in winners 
-                if next((p.pact_id for p in parties if p.id == c.party_id), None) == pacto
+                if pact_of_party.get(c.party_id) == pacto
             ]
             votos_pacto = pact_votes.get(pacto, 0)
             escanos_pacto = pact_alloc[pacto]
@@ -487,7 +775,7 @@ class DiputadosService:
             {
                 "nombre": c.name,
                 "partido": c.party_id,
-                "pacto": next((p.pact_id for p in parties if p.id == c.party_id), ""),
+                "pacto": pact_of_party.get(c.party_id, ""),
                 "votos": c.votes
             }
             for c in candidates
@@ -496,6 +784,7 @@ class DiputadosService:
         result = {
             "distrito": distrito,
             "total_escanos": seats,
+            "escanos_estimados": escanos_estimados,
             "total_votos": total_votos,
             "pactos": PACTOS_MAPPING,
             "resultado_por_pacto": resultado_por_pacto,
@@ -509,9 +798,9 @@ class DiputadosService:
                     "name": c.name,
                     "party_id": c.party_id,
                     "party_name": c.party_id,
-                    "pact_id": next((p.pact_id for p in parties if p.id == c.party_id), None),
+                    "pact_id": pact_of_party.get(c.party_id),
                     "pact_name": get_pacto_nombre(
-                        next((p.pact_id for p in parties if p.id == c.party_id), None) or ""
+                        pact_of_party.get(c.party_id) or ""
                     ),
                     "votes": c.votes,
                 }
@@ -521,85 +810,86 @@ class DiputadosService:
 
         return result
 
+    def _resumen_distrito(self, d: int) -> Tuple[List[tuple], bool]:
+        """
+        Calcula la asignación D'Hondt de un distrito para el resumen nacional.
+        Retorna ([(pacto, escaños, votos_pacto, {partido: (escaños, votos)}), ...], escaños estimados)
+        """
+        filas = fetch_emol_csv(str(d))
+        if not filas:
+            return [], False
+
+        seats, escanos_estimados = get_seats_for_district_api(str(d))
+        encuesta_lista = self.encuestas_by_d.get(str(d), [])
+        if not encuesta_lista:
+            logger.warning("⚠️ No se encontró encuesta para el distrito %s", d)
+            return [], False
+
+        # Asignar votos
+        candidates = self._build_candidates(str(d))
+
+        # Agrupar por partido y pacto en una sola pasada
+        pacto_de_partido: Dict[str, Optional[str]] = {}
+        votos_partido: Dict[str, float] = {}
+        votos_pacto: Dict[str, float] = {}
+        for c in candidates:
+            if c.pact_id:
+                votos_pacto[c.pact_id] = 0
+            if c.party_id:
+                pacto_de_partido.setdefault(c.party_id, c.pact_id)
+                votos_partido[c.party_id] = votos_partido.get(c.party_id, 0) + c.votes
+
+        parties = [
+            Party(id=partido, name=partido, votes=votos_partido[partido], pact_id=pacto_de_partido[partido])
+            for partido in sorted(pacto_de_partido)
+        ]
+        for p in parties:
+            if p.pact_id in votos_pacto:
+                votos_pacto[p.pact_id] += p.votes
+        pacts = [Pact(id=pacto, name=pacto, votes=votos_pacto[pacto]) for pacto in sorted(votos_pacto)]
+
+        # Aplicar D'Hondt
+        pact_votes = {p.id: p.votes for p in pacts if p.id}
+        pact_alloc = dhondt_alloc(pact_votes, seats)
+
+        asignaciones = []
+        for pacto, n_seats in pact_alloc.items():
+            sub_parties = [p for p in parties if p.pact_id == pacto]
+            sub_votes = {p.id: p.votes for p in sub_parties if p.votes > 0}
+            if not sub_votes:
+                continue
+            sub_alloc = dhondt_alloc(sub_votes, n_seats)
+            asignaciones.append((
+                pacto,
+                n_seats,
+                pact_votes.get(pacto, 0),
+                {pid: (n, sub_votes[pid]) for pid, n in sub_alloc.items()},
+            ))
+
+        return asignaciones, escanos_estimados
+
     def resumen_nacional(self) -> Dict[str, Any]:
         """Calcula resumen nacional de todos los distritos."""
         distritos = list(range(1, 29))
         resumen_pactos: Dict[str, Dict[str, Any]] = {}
         resumen_partidos: Dict[str, Dict[str, Any]] = {}
 
-        for d in distritos:
-            df = fetch_emol_csv(str(d))
-            if df.empty:
-                continue
-
-            seats = get_seats_for_district_api(str(d))
-            encuesta_lista = self.encuestas_by_d.get(str(d), [])
-            if not encuesta_lista:
-                print(f"⚠️ No se encontró encuesta para el distrito {d}")
-                continue
-
-            # Asignar votos
-            candidates = []
-            matched_encuestas = set()
-
-            for idx, (_, row) in enumerate(df.iterrows()):
-                nombre_emol = normalize(row.get("nombre") or "")
-                mejor_ratio = 0
-                best_idx = None
-
-                for e_idx, enc in enumerate(encuesta_lista):
-                    nombre_enc = normalize(enc["nombre"])
-                    ratio = difflib.SequenceMatcher(None, nombre_emol, nombre_enc).ratio()
-                    if ratio > mejor_ratio:
-                        mejor_ratio = ratio
-                        best_idx = e_idx
-
-                if best_idx is not None and mejor_ratio >= 0.8:
-                    enc = encuesta_lista[best_idx]
-                    votos = float(enc["votos"])
-                    matched_encuestas.add(best_idx)
-                else:
-                    votos = 0
-
-                candidates.append(Candidate(
-                    id=str(row.get("id_foto", idx)),
-                    name=row["nombre"],
-                    party_id=row.get("cupo"),
-                    votes=votos,
-                ))
-
-            # Agrupar por partido y pacto
-            parties = []
-            for partido, grupo in df.groupby("cupo"):
-                pacto = grupo["pacto"].iloc[0] if "pacto" in grupo and pd.notna(grupo["pacto"].iloc[0]) else None
-                votos = sum(c.votes for c in candidates if c.party_id == partido)
-                parties.append(Party(id=partido, name=partido, votes=votos, pact_id=pacto))
-
-            pacts = []
-            for pacto, grupo in df.groupby("pacto"):
-                votos = sum(p.votes for p in parties if p.pact_id == pacto)
-                pacts.append(Pact(id=pacto, name=pacto, votes=votos))
-
-            # Aplicar D'Hondt
-            pact_votes = {p.id: p.votes for p in pacts if p.id}
-            pact_alloc = dhondt_alloc(pact_votes, seats)
-
-            for pacto, n_seats in pact_alloc.items():
-                sub_parties = [p for p in parties if p.pact_id == pacto]
-                sub_votes = {p.id: p.votes for p in sub_parties if p.votes > 0}
-                if not sub_votes:
-                    continue
-                sub_alloc = dhondt_alloc(sub_votes, n_seats)
+        # Los distritos son independientes: se calculan en paralelo
+        # y se acumulan en orden en este thread
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            por_distrito = list(executor.map(self._resumen_distrito, distritos))
 
+        for asignaciones, _ in por_distrito:
+            for pacto, n_seats, votos_pacto, sub_alloc in asignaciones:
                 # Acumular nacional
                 resumen_pactos.setdefault(pacto, {"escaños": 0, "votos": 0})
                 resumen_pactos[pacto]["escaños"] += n_seats
-                resumen_pactos[pacto]["votos"] += pact_votes.get(pacto, 0)
+                resumen_pactos[pacto]["votos"] += votos_pacto
 
-                for pid, n in sub_alloc.items():
+                for pid, (n, votos_partido) in sub_alloc.items():
                     resumen_partidos.setdefault(pid, {"escaños": 0, "votos": 0, "pacto": pacto})
                     resumen_partidos[pid]["escaños"] += n
-                    resumen_partidos[pid]["votos"] += next((p.votes for p in parties if p.id == pid), 0)
+                    resumen_partidos[pid]["votos"] += votos_partido
 
         # Calcular porcentajes
         total_votos = sum(v["votos"] for v in resumen_pactos.values())
@@ -609,6 +899,7 @@ class DiputadosService:
 
         result = {
             "total_votos": total_votos,
+            "escanos_estimados": any(estimado for _, estimado in por_distrito),
             "pactos": [
                 {"id": k, **v}
                 for k, v in sorted(resumen_pactos.items(), key=lambda x: x[1]["escaños"], reverse=True)
@@ -677,72 +968,47 @@ class DiputadosService:
         return {
             "distrito": distrito,
             "total_escaños": total_escaños,
+            "escanos_estimados": dhondt_result["escanos_estimados"],
             "total_votos": total_votos,
             "pactos": resultado
         }
 
+    def _candidatos_con_votos(self, distrito_num: int) -> List[Candidate]:
+        """Candidatos de un distrito que tienen votos de encuesta."""
+        try:
+            return [c for c in self._build_candidates(str(distrito_num)) if c.votes > 0]
+        except Exception as e:
+            logger.warning("⚠️ Error procesando distrito %s: %s", distrito_num, e)
+            return []
+
     def get_todos_candidatos(self) -> List[Dict[str, Any]]:
         """
         Obtiene todos los candidatos de todos los distritos que tienen votos.
         Estructura: Array con nombre, partido, pacto, distrito y votos.
         """
-        # Mapeo de colores por pacto (basado en imagen mostrada)
-        colores_pactos = {
-            "Unidad por Chile (FA, PS, DC, PPD, PL, PR)": "#FF1493",  # Rosa
-            "Chile Grande y Unido (UDI, RN, Evópoli, Demócratas)": "#ADD8E6",  # Azul
-            "Cambio por Chile (PSC, PNL, REP)": "#FFFF99",  # Amarillo
-            "Movimiento Amarillos por Chile": "#FFFF99",  # Amarillo
-            "Partido de la Gente": "#D2B48C",  # Beige/Marrón
-            "Verdes, Regionalistas y Humanistas (FRVS, AH)": "#90EE90",  # Verde claro
-        }
-        
         todos_candidatos = []
-        
-        # Iterar sobre todos los distritos (1-28)
-        for distrito_num in range(1, 29):
-            try:
-                df = fetch_emol_csv(str(distrito_num))
-                
-                if df.empty:
-                    continue
-                
-                encuesta_lista = self.encuestas_by_d.get(str(distrito_num), [])
-                
-                # Procesar cada candidato
-                for idx, (_, row) in enumerate(df.iterrows()):
-                    nombre = row.get("nombre", "")
-                    partido = row.get("cupo", "")
-                    pacto = row.get("pacto", "")
-                    
-                    # Buscar votos desde encuesta
-                    votos = 0.0
-                    nombre_norm = normalize(nombre)
-                    
-                    for enc in encuesta_lista:
-                        nombre_enc = normalize(enc.get("nombre", ""))
-                        ratio = difflib.SequenceMatcher(None, nombre_norm, nombre_enc).ratio()
-                        if ratio > 0.8:
-                            votos = float(enc.get("votos", 0) or 0)
-                            break
-                    
-                    # Solo incluir si tiene votos
-                    if votos > 0:
-                        # Obtener color del pacto
-                        color = colores_pactos.get(pacto, "#CCCCCC")  # Gris por defecto
-                        
-                        todos_candidatos.append({
-                            "nombre": nombre,
-                            "partido": partido,
-                            "pacto": pacto,
-                            "distrito": distrito_num,
-                            "votos": votos,
-                            "color": color
-                        })
-            
-            except Exception as e:
-                print(f"⚠️ Error procesando distrito {distrito_num}: {e}")
-                continue
-        
+
+        # Los distritos son independientes: se calculan en paralelo
+        # y se recorren en orden en este thread
+        distritos = list(range(1, 29))
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            por_distrito = list(executor.map(self._candidatos_con_votos, distritos))
+
+        for distrito_num, candidatos in zip(distritos, por_distrito):
+            for c in candidatos:
+                pacto = c.pact_id or ""
+                # Obtener color del pacto
+                color = _COLORES_PACTOS.get(pacto, "#CCCCCC")  # Gris por defecto
+
+                todos_candidatos.append({
+                    "nombre": c.name or "",
+                    "partido": c.party_id or "",
+                    "pacto": pacto,
+                    "distrito": distrito_num,
+                    "votos": c.votes,
+                    "color": color
+                })
+
         # Ordenar por votos (descendente)
         todos_candidatos.sort(key=lambda x: x["votos"], reverse=True)
         
@@ -8,6 +8,18 @@ class Config:
     DEBUG = False
     TESTING = False
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
+    
+    # Nivel de logging de la aplicación (DEBUG, INFO, WARNING...)
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    
+    # Descargar datos de Emol al crear la app y no en la primera request
+    WARMUP_CACHE = True
+    
+    # Compresión de respuestas JSON (Flask-Compress)
+    COMPRESS_MIMETYPES = ['application/json']
+    COMPRESS_ALGORITHM = ['br', 'gzip']
+    COMPRESS_LEVEL = 6
+    COMPRESS_MIN_SIZE = 500
 
 class DevelopmentConfig(Config):
     """Configuración para desarrollo"""
@@ -20,6 +32,7 @@ class ProductionConfig(Config):
 class TestingConfig(Config):
     """Configuración para testing"""
     TESTING = True
+    WARMUP_CACHE = False
 
 config = {
     'development': DevelopmentConfig,
@@ -0,0 +1,21 @@
+import os
+
+# Configuración de Gunicorn para producción.
+# Las llamadas a Emol y a la API de encuestas son bloqueantes: con workers
+# gthread cada proceso atiende varias requests mientras espera la red.
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 5))
+timeout = 60
+
+# Crea la app antes de hacer fork: pactos y encuestas se cargan una sola vez
+# y los workers los comparten (copy-on-write)
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Cada worker abre sus propias conexiones HTTP en vez de heredar
+    # los sockets que el master usó al precargar la app
+    from app.services.diputados_service import SESSION
+    SESSION.close()
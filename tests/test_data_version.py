@@ -0,0 +1,59 @@
+# tests/test_data_version.py
+import os
+
+import orjson
+import pytest
+import requests
+
+from app.services import diputados_service as svc
+
+DIP_CSV = os.path.join(os.path.dirname(os.path.dirname(__file__)), "dip.csv")
+ENCUESTA_URL = "https://dhondt.azurewebsites.net/api/encuestas"
+
+
+class _Respuesta:
+    def __init__(self, content: bytes):
+        self.content = content
+
+    def raise_for_status(self) -> None:
+        pass
+
+
+@pytest.fixture
+def upstreams(monkeypatch):
+    """Emol y la encuesta simulados; cada URL se puede marcar como caída."""
+    with open(DIP_CSV, "rb") as f:
+        csv_bytes = f.read()
+    encuesta = {"D10": [{"nombre": "Gonzalo Winter", "votos": 1000}]}
+    contenidos = {
+        svc.EMOL_CSV_URL: csv_bytes,
+        svc.DB_URL: orjson.dumps({"dbzonas": {"6010": {"q": 8, "r": "13"}}}),
+        ENCUESTA_URL: orjson.dumps(encuesta),
+    }
+    caidas = set()
+
+    def get(url, timeout=None):
+        if url in caidas:
+            raise requests.ConnectionError(f"{url} caído")
+        return _Respuesta(contenidos[url])
+
+    monkeypatch.setattr(svc.SESSION, "get", get)
+    svc.invalidate_cache()
+    svc.diputados_service.reload_encuesta()
+    yield caidas
+    svc.invalidate_cache()
+    svc.diputados_service.reload_encuesta()
+
+
+def test_csv_recuperado_con_db_caido(upstreams):
+    # Emol completo caído: el resultado de error queda memoizado
+    upstreams.update({svc.EMOL_CSV_URL, svc.DB_URL})
+    assert "error" in svc.diputados_service.compute_dhondt("10")
+    assert svc.diputados_service.get_todos_candidatos() == []
+
+    # Vuelve el CSV pero db.json sigue caído: la versión debe avanzar igual
+    upstreams.discard(svc.EMOL_CSV_URL)
+    resultado = svc.diputados_service.compute_dhondt("10")
+    assert "error" not in resultado
+    assert resultado["candidatos_cargados"]["total"] > 0
+    assert svc.diputados_service.get_todos_candidatos() != []